@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Chunked Arrow IPC and Parquet encoders for streaming API responses.
+"""
+
+import io
+from typing import Iterator, List
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object whose contents are drained as they are written."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def arrow_stream(table: pa.Table, batch_rows: int) -> Iterator[bytes]:
+    """Yield an Arrow IPC stream one record batch at a time."""
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=batch_rows):
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def parquet_stream(table: pa.Table, batch_rows: int) -> Iterator[bytes]:
+    """Yield a Parquet file one row group at a time."""
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=batch_rows):
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+ClickHouse and DuckDB access for the marts API.
+ClickHouse clients are pooled; DuckDB is opened per query so dbt can still
+take its write lock. Both return Arrow tables.
+"""
+
+import os
+import queue
+import threading
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional
+
+import duckdb
+import clickhouse_connect
+import pyarrow as pa
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """Bounded pool of reusable connections built by a factory."""
+
+    def __init__(self, factory: Callable[[], Any], size: int,
+                 close: Callable[[Any], None], timeout: float = 30.0):
+        """
+        Initialize the pool. Connections are created lazily.
+
+        Args:
+            factory: Callable that opens a new connection
+            size: Maximum number of open connections
+            close: Callable that closes a connection
+            timeout: Seconds to wait for a free connection
+        """
+        self.factory = factory
+        self.size = size
+        self.timeout = timeout
+        self._close = close
+        self._idle: 'queue.LifoQueue[Any]' = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """Check out a connection, returning it to the pool afterwards."""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No connection available within {self.timeout}s")
+        generation = self._generation
+        conn = None
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self.factory()
+            yield conn
+        except Exception:
+            # Don't hand a possibly broken connection to the next caller
+            if conn is not None:
+                self._discard(conn)
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                if generation == self._generation:
+                    self._idle.put(conn)
+                else:
+                    self._discard(conn)
+            self._slots.release()
+
+    def close(self):
+        """Close idle connections; checked-out ones are closed on return."""
+        with self._lock:
+            self._generation += 1
+            while True:
+                try:
+                    self._discard(self._idle.get_nowait())
+                except queue.Empty:
+                    break
+
+    def _discard(self, conn: Any):
+        try:
+            self._close(conn)
+        except Exception as e:
+            logger.warning(f"Error closing pooled connection: {str(e)}")
+
+
+class ClickHousePool:
+    """Pool of clickhouse-connect clients."""
+
+    def __init__(self, size: Optional[int] = None):
+        self.settings = {
+            'host': os.getenv('CLICKHOUSE_HOST', 'localhost'),
+            'port': int(os.getenv('CLICKHOUSE_PORT', '8123')),
+            'username': os.getenv('CLICKHOUSE_USER', 'default'),
+            'password': os.getenv('CLICKHOUSE_PASSWORD', ''),
+            'database': os.getenv('CLICKHOUSE_DATABASE', 'default'),
+        }
+        self.pool = ConnectionPool(
+            factory=self._connect,
+            size=size or int(os.getenv('API_CLICKHOUSE_POOL_SIZE', '4')),
+            close=lambda client: client.close(),
+        )
+        self.probe_timeout = float(os.getenv('API_CLICKHOUSE_PROBE_TIMEOUT', '2'))
+        self._probe_client = None
+        self._probe_lock = threading.Lock()
+
+    def _connect(self):
+        logger.info(f"Opening ClickHouse connection to {self.settings['host']}:{self.settings['port']}")
+        # Session ids serialize queries per client; pooling makes them unnecessary
+        return clickhouse_connect.get_client(autogenerate_session_id=False, **self.settings)
+
+    def query_arrow(self, sql: str, params: Optional[Dict[str, Any]] = None) -> pa.Table:
+        """Run a query using server-side {name:Type} parameter binding."""
+        with self.pool.connection() as client:
+            return client.query_arrow(sql, parameters=params or {})
+
+    def last_load(self, loads_table: str) -> Hashable:
+        """
+        Latest dlt load in a _dlt_loads table, used to detect new data.
+
+        Uses its own client with short timeouts so an unresponsive server fails
+        the probe quickly instead of holding up the request that triggered it.
+        """
+        with self._probe_lock:
+            try:
+                if self._probe_client is None:
+                    self._probe_client = clickhouse_connect.get_client(
+                        autogenerate_session_id=False,
+                        connect_timeout=self.probe_timeout,
+                        send_receive_timeout=self.probe_timeout,
+                        **self.settings,
+                    )
+                return tuple(self._probe_client.query(
+                    f"select max(inserted_at), count() from {loads_table}"
+                ).result_rows[0])
+            except Exception:
+                self._close_probe_client()
+                raise
+
+    def _close_probe_client(self):
+        if self._probe_client is not None:
+            try:
+                self._probe_client.close()
+            except Exception as e:
+                logger.warning(f"Error closing ClickHouse probe client: {str(e)}")
+            self._probe_client = None
+
+    def close(self):
+        self.pool.close()
+        with self._probe_lock:
+            self._close_probe_client()
+
+
+class DuckDBReader:
+    """Read-only queries on the dbt DuckDB database."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = os.path.expanduser(
+            path or os.getenv('DUCKDB_PATH', './data/duckdb/main.duckdb')
+        )
+
+    def query_arrow(self, sql: str, params: Optional[Dict[str, Any]] = None) -> pa.Table:
+        """
+        Run a query using $name parameter binding.
+
+        The file is held only for the duration of the query: any open handle,
+        even read-only, blocks dbt from taking its write lock. Cache hits never
+        reach this, so the reopen cost is only paid on misses.
+        """
+        if not Path(self.path).exists():
+            raise FileNotFoundError(f"DuckDB database not found: {self.path}")
+        with duckdb.connect(self.path, read_only=True) as conn:
+            return conn.execute(sql, params or {}).fetch_arrow_table()
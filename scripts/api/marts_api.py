@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Read API over the dbt marts.
+Serves daily_reddit_summary from DuckDB and the HackerNews staging models from
+ClickHouse, with cached response bodies and Arrow/Parquet streaming for large
+pulls.
+
+Run from this directory:
+    uvicorn marts_api:app --host 0.0.0.0 --port 8000
+"""
+
+import os
+import logging
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Callable, Dict, Optional
+
+import orjson
+import pyarrow as pa
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
+
+from arrow_streams import arrow_stream, parquet_stream
+from connections import ClickHousePool, DuckDBReader
+from query_cache import ChangeWatcher, QueryCache, run_results_path, run_results_probe
+
+logger = logging.getLogger(__name__)
+
+CLICKHOUSE_SCHEMA = os.getenv('CLICKHOUSE_DBT_SCHEMA', 'dbt_dev')
+CLICKHOUSE_DLT_LOADS_TABLE = os.getenv('CLICKHOUSE_DLT_LOADS_TABLE', 'dlt.hackernews___dlt_loads')
+DUCKDB_SCHEMA = os.getenv('DUCKDB_MARTS_SCHEMA', 'main')
+STREAM_BATCH_ROWS = int(os.getenv('API_STREAM_BATCH_ROWS', '65536'))
+MAX_LIMIT = 1_000_000
+# JSON is built in memory; larger pulls should use format=arrow or parquet
+MAX_JSON_LIMIT = int(os.getenv('API_MAX_JSON_LIMIT', '10000'))
+
+clickhouse = ClickHousePool()
+backends = {
+    'clickhouse': clickhouse,
+    'duckdb': DuckDBReader(),
+}
+
+# HackerNews data is replaced by the dlt load, not by dbt (the ClickHouse
+# models are views), so watch both the dlt loads table and dbt runs there
+watcher = ChangeWatcher({
+    'clickhouse': [
+        lambda: clickhouse.last_load(CLICKHOUSE_DLT_LOADS_TABLE),
+        run_results_probe(run_results_path('clickhouse')),
+    ],
+    'duckdb': [run_results_probe(run_results_path('duckdb'))],
+})
+cache = QueryCache()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    clickhouse.close()
+
+
+app = FastAPI(title='Doctor Data marts API', lifespan=lifespan)
+
+
+class ResultFormat(str, Enum):
+    json = 'json'
+    arrow = 'arrow'
+    parquet = 'parquet'
+
+
+MEDIA_TYPES = {
+    ResultFormat.json: 'application/json',
+    ResultFormat.arrow: 'application/vnd.apache.arrow.stream',
+    ResultFormat.parquet: 'application/vnd.apache.parquet',
+}
+EXTENSIONS = {ResultFormat.arrow: 'arrows', ResultFormat.parquet: 'parquet'}
+
+
+def _records(table: pa.Table):
+    names = table.column_names
+    return [dict(zip(names, row)) for row in zip(*table.to_pydict().values())]
+
+
+def records_json(table: pa.Table) -> bytes:
+    """Encode a table as a JSON array of row objects."""
+    return orjson.dumps(_records(table), default=str)
+
+
+def check_json_limit(limit: int, result_format: ResultFormat):
+    """Reject JSON pulls too large to build in memory."""
+    if result_format == ResultFormat.json and limit > MAX_JSON_LIMIT:
+        raise HTTPException(
+            status_code=422,
+            detail=f"limit above {MAX_JSON_LIMIT} requires format=arrow or format=parquet",
+        )
+
+
+def fetch(backend: str, sql: str, params: Dict[str, Any]) -> pa.Table:
+    """Run a query against a backend, mapping failures to 502."""
+    try:
+        return backends[backend].query_arrow(sql, params)
+    except Exception as e:
+        logger.error(f"Query failed on {backend}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=502, detail=f"{backend} query failed")
+
+
+def run_query(backend: str, sql: str, params: Dict[str, Any],
+              result_format: ResultFormat = ResultFormat.json, name: str = 'result',
+              encode_json: Callable[[pa.Table], bytes] = records_json) -> Response:
+    """
+    Serve a query in the requested format, caching the encoded body.
+
+    Cache hits return the stored bytes as-is, so repeated loads neither query
+    the backend nor re-encode the result.
+    """
+    key = cache.make_key(backend, sql, params, result_format.value)
+    # Read before querying so a result racing a data change is stored as stale
+    generation = watcher.generation(backend)
+    media_type = MEDIA_TYPES[result_format]
+    headers = {}
+    if result_format in EXTENSIONS:
+        headers['Content-Disposition'] = f'attachment; filename="{name}.{EXTENSIONS[result_format]}"'
+
+    body = cache.get(key, generation)
+    if body is not None:
+        return Response(body, media_type=media_type, headers=headers)
+
+    table = fetch(backend, sql, params)
+    if result_format == ResultFormat.json:
+        body = encode_json(table)
+        cache.put(key, body, generation)
+        return Response(body, media_type=media_type)
+
+    encode = arrow_stream if result_format == ResultFormat.arrow else parquet_stream
+    return StreamingResponse(
+        cache.tee(key, encode(table, STREAM_BATCH_ROWS), generation),
+        media_type=media_type,
+        headers=headers,
+    )
+
+
+@app.get('/health')
+def health():
+    """Liveness check with cache counters."""
+    return {'status': 'ok', 'cache': cache.stats()}
+
+
+@app.post('/cache/invalidate')
+def invalidate_cache(backend: Optional[str] = None):
+    """Drop cached results without waiting for the next change check."""
+    if backend is not None and backend not in backends:
+        raise HTTPException(status_code=404, detail=f"Unknown backend: {backend}")
+    return {'invalidated': cache.invalidate(backend)}
+
+
+@app.get('/reddit/daily-summary')
+def reddit_daily_summary(
+    subreddit: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    limit: int = Query(1000, ge=1, le=MAX_LIMIT),
+    format: ResultFormat = ResultFormat.json,
+):
+    """Daily Reddit activity by subreddit from the daily_reddit_summary mart."""
+    check_json_limit(limit, format)
+    filters = []
+    params: Dict[str, Any] = {'limit': limit}
+    if subreddit:
+        filters.append('subreddit = $subreddit')
+        params['subreddit'] = subreddit
+    if start_date:
+        filters.append('date >= $start_date')
+        params['start_date'] = start_date
+    if end_date:
+        filters.append('date <= $end_date')
+        params['end_date'] = end_date
+    where = f"where {' and '.join(filters)}" if filters else ''
+
+    sql = f"""
+        select
+            date, subreddit, post_count, total_score, avg_score,
+            total_comments, avg_comments, avg_upvote_ratio, unique_authors,
+            updated_at
+        from {DUCKDB_SCHEMA}.daily_reddit_summary
+        {where}
+        order by date desc, total_score desc
+        limit $limit
+    """
+    return run_query('duckdb', sql, params, format, 'daily_reddit_summary')
+
+
+@app.get('/hackernews/stories')
+def hackernews_stories(
+    since: Optional[datetime] = None,
+    min_score: Optional[int] = None,
+    limit: int = Query(1000, ge=1, le=MAX_LIMIT),
+    format: ResultFormat = ResultFormat.json,
+):
+    """Most recent HackerNews stories from stg_stories."""
+    check_json_limit(limit, format)
+    filters = []
+    params: Dict[str, Any] = {'limit': limit}
+    if since:
+        filters.append('time >= {since:Int64}')
+        params['since'] = int(since.timestamp())
+    if min_score is not None:
+        filters.append('score >= {min_score:Int64}')
+        params['min_score'] = min_score
+    where = f"where {' and '.join(filters)}" if filters else ''
+
+    sql = f"""
+        select
+            id, `by`, title, url, score, descendants,
+            toDateTime(time) as created_at
+        from {CLICKHOUSE_SCHEMA}.stg_stories
+        {where}
+        order by time desc
+        limit {{limit:UInt32}}
+    """
+    return run_query('clickhouse', sql, params, format, 'stories')
+
+
+@app.get('/hackernews/stories/{story_id}/comments')
+def hackernews_story_comments(
+    story_id: int,
+    limit: int = Query(1000, ge=1, le=MAX_LIMIT),
+    format: ResultFormat = ResultFormat.json,
+):
+    """Direct replies to a story from stg_comments."""
+    check_json_limit(limit, format)
+    sql = f"""
+        select
+            id, `by`, parent, text,
+            toDateTime(time) as created_at
+        from {CLICKHOUSE_SCHEMA}.stg_comments
+        where parent = {{story_id:Int64}}
+        order by time
+        limit {{limit:UInt32}}
+    """
+    params = {'story_id': story_id, 'limit': limit}
+    return run_query('clickhouse', sql, params, format, f'comments_{story_id}')
+
+
+@app.get('/hackernews/users/{user_id}')
+def hackernews_user(user_id: str):
+    """A single HackerNews user profile from stg_users."""
+    sql = f"""
+        select id, karma, about, toDateTime(created) as created_at
+        from {CLICKHOUSE_SCHEMA}.stg_users
+        where id = {{user_id:String}}
+        limit 1
+    """
+
+    def first_row(table: pa.Table) -> bytes:
+        rows = _records(table)
+        if not rows:
+            raise HTTPException(status_code=404, detail=f"User not found: {user_id}")
+        return orjson.dumps(rows[0], default=str)
+
+    return run_query('clickhouse', sql, {'user_id': user_id}, encode_json=first_row)
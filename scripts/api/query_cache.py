@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+In-process result cache for the marts API.
+Encoded response bodies are keyed by backend, SQL, parameters and format, and
+are dropped when the
+data behind a backend changes (a dbt run or a new dlt load).
+"""
+
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+# dbt rewrites run_results.json at the end of every run/build/seed
+DEFAULT_RUN_RESULTS = {
+    'clickhouse': PROJECT_ROOT / 'dbt' / 'clickhouse' / 'target' / 'run_results.json',
+    'duckdb': PROJECT_ROOT / 'dbt' / 'duckdb' / 'target' / 'run_results.json',
+}
+
+
+def run_results_path(project: str) -> Path:
+    """Location of a dbt project's run_results.json, overridable via DBT_<PROJECT>_RUN_RESULTS."""
+    override = os.getenv(f'DBT_{project.upper()}_RUN_RESULTS')
+    return Path(os.path.expanduser(override)) if override else DEFAULT_RUN_RESULTS[project]
+
+
+def run_results_probe(path: Path) -> Callable[[], int]:
+    """
+    Build a probe returning the mtime of a dbt run_results.json.
+
+    A missing file is logged once, since it means dbt runs for that project
+    will never invalidate the cache.
+    """
+    warned = False
+
+    def probe() -> int:
+        nonlocal warned
+        try:
+            return path.stat().st_mtime_ns
+        except FileNotFoundError:
+            if not warned:
+                logger.warning(f"dbt run results not found at {path}; set DBT_*_RUN_RESULTS if dbt writes elsewhere")
+                warned = True
+            return 0
+
+    return probe
+
+
+class _BackendState:
+    """Last known probe tokens for one backend, refreshed under its own lock."""
+
+    def __init__(self, probe_count: int):
+        self.lock = threading.Lock()
+        self.checked_at: Optional[float] = None
+        self.tokens: List[Hashable] = [0] * probe_count
+        self.failures = [0] * probe_count
+
+
+class ChangeWatcher:
+    """Tracks a data generation token per backend using cheap probes."""
+
+    def __init__(self, probes: Dict[str, List[Callable[[], Hashable]]],
+                 check_interval: Optional[float] = None,
+                 max_failures: Optional[int] = None):
+        """
+        Initialize the watcher.
+
+        Args:
+            probes: Mapping of backend name to callables that each return a
+                    token changing whenever that backend's data changes
+            check_interval: Minimum seconds between probe runs per backend
+            max_failures: Consecutive failures of a probe after which the
+                          backend's data is treated as unknown and cached
+                          entries are no longer served
+        """
+        self.probes = probes
+        if check_interval is None:
+            check_interval = float(os.getenv('API_CACHE_CHECK_INTERVAL', '1.0'))
+        if max_failures is None:
+            max_failures = int(os.getenv('API_CACHE_MAX_PROBE_FAILURES', '3'))
+        self.check_interval = check_interval
+        self.max_failures = max_failures
+        self._states = {backend: _BackendState(len(p)) for backend, p in probes.items()}
+
+    def generation(self, backend: str) -> Hashable:
+        """
+        Get the current data generation for a backend.
+
+        Probes only run once per check_interval, and only for the backend asked
+        about. While one request is probing, others get the last known token
+        instead of waiting on it, so cache hits stay in-memory.
+        """
+        state = self._states.get(backend)
+        if state is None:
+            return 0
+        now = time.monotonic()
+        if state.checked_at is None or now - state.checked_at >= self.check_interval:
+            # Only the very first check has no token to fall back on
+            if state.lock.acquire(blocking=state.checked_at is None):
+                try:
+                    if state.checked_at is None or now - state.checked_at >= self.check_interval:
+                        self._refresh(backend, state)
+                        state.checked_at = now
+                finally:
+                    state.lock.release()
+        if max(state.failures) >= self.max_failures:
+            # Unique token: nothing cached matches it, and nothing stored under it is reused
+            return object()
+        return tuple(state.tokens)
+
+    def _refresh(self, backend: str, state: _BackendState):
+        """Re-run a backend's probes, keeping the last token of any that fail."""
+        for i, probe in enumerate(self.probes[backend]):
+            try:
+                token = probe()
+            except Exception as e:
+                state.failures[i] += 1
+                if state.failures[i] == 1:
+                    logger.warning(f"Change probe failed for {backend}: {str(e)}")
+                if state.failures[i] == self.max_failures:
+                    logger.error(f"Change probe for {backend} failed {self.max_failures} times, bypassing its cached results")
+                continue
+            if state.failures[i]:
+                logger.info(f"Change probe for {backend} recovered")
+                state.failures[i] = 0
+            if state.checked_at is not None and state.tokens[i] != token:
+                logger.info(f"Data changed for {backend}, invalidating cached results")
+            state.tokens[i] = token
+
+
+class QueryCache:
+    """LRU cache of encoded response bodies keyed by backend, query, parameters and format."""
+
+    def __init__(self, max_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of cached bodies
+            max_bytes: Maximum total size of cached bodies; bodies larger than
+                       this are served but never cached
+        """
+        self.max_entries = max_entries or int(os.getenv('API_CACHE_MAX_ENTRIES', '256'))
+        self.max_bytes = max_bytes or int(os.getenv('API_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+        self._entries: 'OrderedDict[Hashable, Tuple[Hashable, bytes]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(backend: str, sql: str, params: Optional[Dict[str, Any]] = None,
+                 variant: str = '') -> Hashable:
+        """Build a cache key from a backend, query, its parameters and the output format."""
+        return (backend, sql, tuple(sorted((params or {}).items())), variant)
+
+    def get(self, key: Hashable, generation: Hashable) -> Optional[bytes]:
+        """Return a cached body, or None if missing or from another generation."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] != generation:
+                self._evict(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, body: bytes, generation: Hashable):
+        """
+        Store a body, evicting least recently used entries as needed.
+
+        Args:
+            key: Key from make_key
+            body: Encoded response body
+            generation: Watcher generation read before the query ran, so a
+                        result that raced a data change is never served as fresh
+        """
+        size = len(body)
+        if size > self.max_bytes:
+            logger.debug(f"Body of {size} bytes exceeds cache limit, not caching")
+            return
+        with self._lock:
+            if key in self._entries:
+                self._evict(key)
+            self._entries[key] = (generation, body)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._evict(next(iter(self._entries)))
+
+    def tee(self, key: Hashable, chunks: Iterable[bytes], generation: Hashable) -> Iterator[bytes]:
+        """
+        Pass chunks through to a streaming response, caching the whole body
+        once the stream completes if it fits.
+        """
+        kept: Optional[List[bytes]] = []
+        size = 0
+        for chunk in chunks:
+            if kept is not None:
+                size += len(chunk)
+                if size <= self.max_bytes:
+                    kept.append(chunk)
+                else:
+                    kept = None
+            yield chunk
+        if kept is not None:
+            self.put(key, b''.join(kept), generation)
+
+    def invalidate(self, backend: Optional[str] = None) -> int:
+        """
+        Drop cached results.
+
+        Args:
+            backend: Only drop results for this backend (defaults to all)
+
+        Returns:
+            Number of entries dropped
+        """
+        with self._lock:
+            keys = [k for k in self._entries if backend is None or k[0] == backend]
+            for key in keys:
+                self._evict(key)
+        return len(keys)
+
+    def stats(self) -> Dict[str, int]:
+        """Cache size and hit/miss counters."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def _evict(self, key: Hashable):
+        """Remove a single entry. Caller must hold the lock."""
+        _, body = self._entries.pop(key)
+        self._bytes -= len(body)
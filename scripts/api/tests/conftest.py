@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The API modules use flat imports and are run from scripts/api
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,32 @@
+import io
+
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+from arrow_streams import arrow_stream, parquet_stream
+
+TABLE = pa.table({
+    'id': list(range(1000)),
+    'subreddit': [f'r{i % 7}' for i in range(1000)],
+})
+
+
+def test_arrow_stream_round_trips():
+    chunks = list(arrow_stream(TABLE, batch_rows=128))
+    assert len([c for c in chunks if c]) > 1
+    assert pa.ipc.open_stream(b''.join(chunks)).read_all().equals(TABLE)
+
+
+def test_parquet_stream_round_trips():
+    data = b''.join(parquet_stream(TABLE, batch_rows=128))
+    parquet_file = pq.ParquetFile(io.BytesIO(data))
+    assert parquet_file.num_row_groups == 8
+    assert pq.read_table(io.BytesIO(data)).equals(TABLE)
+
+
+def test_empty_table_streams_schema_only():
+    empty = TABLE.slice(0, 0)
+    assert pa.ipc.open_stream(b''.join(arrow_stream(empty, 128))).read_all().schema == empty.schema
+    assert pq.read_table(io.BytesIO(b''.join(parquet_stream(empty, 128)))).num_rows == 0
@@ -0,0 +1,68 @@
+import pytest
+
+pytest.importorskip('duckdb')
+pytest.importorskip('clickhouse_connect')
+
+from connections import ConnectionPool
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+
+
+def make_pool(size=2):
+    opened = []
+
+    def factory():
+        conn = FakeConnection(len(opened))
+        opened.append(conn)
+        return conn
+
+    pool = ConnectionPool(factory, size=size, close=lambda c: setattr(c, 'closed', True), timeout=0.1)
+    return pool, opened
+
+
+def test_connections_are_reused():
+    pool, opened = make_pool()
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+    assert first is second
+    assert len(opened) == 1
+
+
+def test_connection_discarded_after_exception():
+    pool, opened = make_pool()
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            raise RuntimeError('query failed')
+    assert conn.closed
+
+    with pool.connection() as replacement:
+        assert replacement is not conn
+    assert len(opened) == 2
+
+
+def test_close_discards_idle_and_checked_out_connections():
+    pool, opened = make_pool()
+    with pool.connection() as in_flight:
+        with pool.connection() as idle:
+            pass
+        pool.close()
+        assert idle.closed
+        assert not in_flight.closed
+    assert in_flight.closed
+
+    with pool.connection() as fresh:
+        assert fresh not in (idle, in_flight)
+
+
+def test_checkout_times_out_when_exhausted():
+    pool, _ = make_pool(size=1)
+    with pool.connection():
+        with pytest.raises(TimeoutError):
+            with pool.connection():
+                pass
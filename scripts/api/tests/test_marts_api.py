@@ -0,0 +1,156 @@
+import io
+
+import pytest
+
+pytest.importorskip('fastapi')
+pytest.importorskip('httpx')
+pytest.importorskip('orjson')
+pytest.importorskip('duckdb')
+pytest.importorskip('clickhouse_connect')
+pa = pytest.importorskip('pyarrow')
+
+import duckdb
+from fastapi.testclient import TestClient
+
+import marts_api
+from connections import DuckDBReader
+from query_cache import ChangeWatcher, QueryCache
+
+
+class FakeBackend:
+    """Backend returning a fixed table, optionally running a hook mid-query."""
+
+    def __init__(self, table=None, error=None, during_query=None):
+        self.table = table if table is not None else pa.table({'id': [1, 2]})
+        self.error = error
+        self.during_query = during_query
+        self.calls = 0
+
+    def query_arrow(self, sql, params=None):
+        self.calls += 1
+        if self.during_query:
+            self.during_query()
+        if self.error:
+            raise self.error
+        return self.table
+
+
+class CountingReader(DuckDBReader):
+    calls = 0
+
+    def query_arrow(self, sql, params=None):
+        self.calls += 1
+        return super().query_arrow(sql, params)
+
+
+@pytest.fixture
+def generations():
+    return {'clickhouse': 1, 'duckdb': 1}
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path, generations):
+    path = tmp_path / 'main.duckdb'
+    with duckdb.connect(str(path)) as conn:
+        conn.execute("""
+            create table daily_reddit_summary as
+            select
+                date '2024-01-01' + i::int as date,
+                'r' || (i % 3) as subreddit,
+                i as post_count, i as total_score, 1.0 as avg_score,
+                1 as total_comments, 1.0 as avg_comments, 0.5 as avg_upvote_ratio,
+                2 as unique_authors, timestamp '2024-06-01' as updated_at
+            from range(30) t(i)
+        """)
+
+    watcher = ChangeWatcher(
+        {backend: [lambda b=backend: generations[b]] for backend in generations},
+        check_interval=0,
+    )
+    monkeypatch.setattr(marts_api, 'watcher', watcher)
+    monkeypatch.setattr(marts_api, 'cache', QueryCache())
+    monkeypatch.setitem(marts_api.backends, 'duckdb', CountingReader(str(path)))
+    monkeypatch.setitem(marts_api.backends, 'clickhouse', FakeBackend())
+    return TestClient(marts_api.app)
+
+
+def test_reddit_summary_filters_and_orders(client):
+    response = client.get('/reddit/daily-summary', params={'subreddit': 'r1', 'limit': 2})
+    assert response.status_code == 200
+    rows = response.json()
+    assert [r['subreddit'] for r in rows] == ['r1', 'r1']
+    assert rows[0]['date'] == '2024-01-29'
+    assert rows[0]['date'] > rows[1]['date']
+
+
+def test_cache_hit_skips_query(client):
+    reader = marts_api.backends['duckdb']
+    first = client.get('/reddit/daily-summary', params={'limit': 5})
+    second = client.get('/reddit/daily-summary', params={'limit': 5})
+    assert second.content == first.content
+    assert reader.calls == 1
+    assert marts_api.cache.stats()['hits'] == 1
+
+
+def test_data_change_invalidates(client, generations):
+    reader = marts_api.backends['duckdb']
+    client.get('/reddit/daily-summary')
+    generations['duckdb'] = 2
+    client.get('/reddit/daily-summary')
+    assert reader.calls == 2
+
+
+def test_result_racing_a_data_change_is_stored_stale(client, generations):
+    def dbt_finishes():
+        generations['clickhouse'] = 2
+
+    backend = FakeBackend(during_query=dbt_finishes)
+    marts_api.backends['clickhouse'] = backend
+    client.get('/hackernews/stories')
+    client.get('/hackernews/stories')
+    assert backend.calls == 2
+
+
+def test_backend_error_maps_to_502(client):
+    marts_api.backends['clickhouse'] = FakeBackend(error=ConnectionError('down'))
+    response = client.get('/hackernews/stories')
+    assert response.status_code == 502
+    assert marts_api.cache.stats()['entries'] == 0
+
+
+def test_invalidate_unknown_backend_is_404(client):
+    assert client.post('/cache/invalidate', params={'backend': 'postgres'}).status_code == 404
+
+
+def test_invalidate_drops_entries(client):
+    client.get('/reddit/daily-summary')
+    assert client.post('/cache/invalidate', params={'backend': 'duckdb'}).json() == {'invalidated': 1}
+
+
+def test_user_found_and_missing(client):
+    marts_api.backends['clickhouse'] = FakeBackend(pa.table({'id': ['pg'], 'karma': [1]}))
+    assert client.get('/hackernews/users/pg').json() == {'id': 'pg', 'karma': 1}
+
+    marts_api.backends['clickhouse'] = FakeBackend(pa.table({'id': pa.array([], pa.string())}))
+    assert client.get('/hackernews/users/nobody').status_code == 404
+
+
+def test_json_limit_is_capped(client):
+    response = client.get('/reddit/daily-summary', params={'limit': marts_api.MAX_JSON_LIMIT + 1})
+    assert response.status_code == 422
+    response = client.get('/reddit/daily-summary', params={'limit': marts_api.MAX_JSON_LIMIT + 1, 'format': 'arrow'})
+    assert response.status_code == 200
+
+
+def test_arrow_and_parquet_are_cached_as_bytes(client):
+    import pyarrow.parquet as pq
+
+    reader = marts_api.backends['duckdb']
+    arrow = client.get('/reddit/daily-summary', params={'format': 'arrow'})
+    assert pa.ipc.open_stream(arrow.content).read_all().num_rows == 30
+    assert client.get('/reddit/daily-summary', params={'format': 'arrow'}).content == arrow.content
+
+    parquet = client.get('/reddit/daily-summary', params={'format': 'parquet'})
+    assert pq.read_table(io.BytesIO(parquet.content)).num_rows == 30
+    assert parquet.headers['content-disposition'].endswith('.parquet"')
+    assert reader.calls == 2
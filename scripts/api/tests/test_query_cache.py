@@ -0,0 +1,182 @@
+import os
+import threading
+
+from query_cache import ChangeWatcher, QueryCache, run_results_probe
+
+
+def test_lru_evicts_least_recently_used():
+    cache = QueryCache(max_entries=2)
+    a, b, c = (cache.make_key('duckdb', sql) for sql in ('a', 'b', 'c'))
+    cache.put(a, b'1', 0)
+    cache.put(b, b'1', 0)
+    assert cache.get(a, 0) is not None  # a is now most recently used
+    cache.put(c, b'1', 0)
+
+    assert cache.get(b, 0) is None
+    assert cache.get(a, 0) is not None
+    assert cache.get(c, 0) is not None
+
+
+def test_byte_accounting_tracks_puts_and_evictions():
+    small, large = b'x' * 10, b'x' * 100
+    cache = QueryCache(max_bytes=len(small) + len(large))
+    k1, k2, k3 = (cache.make_key('duckdb', sql) for sql in ('1', '2', '3'))
+
+    cache.put(k1, small, 0)
+    cache.put(k2, large, 0)
+    assert cache.stats()['bytes'] == 110
+
+    # Replacing a key must not double count it
+    cache.put(k1, small, 0)
+    assert cache.stats()['bytes'] == 110
+
+    # Over the byte budget: oldest entries go until it fits
+    cache.put(k3, large, 0)
+    assert cache.stats() == {'entries': 2, 'bytes': 110, 'hits': 0, 'misses': 0}
+    assert cache.get(k2, 0) is None
+
+    assert cache.invalidate() == 2
+    assert cache.stats()['bytes'] == 0
+
+
+def test_oversized_bodies_are_not_cached():
+    cache = QueryCache(max_bytes=1)
+    cache.put(cache.make_key('duckdb', 'select 1'), b'too big', 0)
+    assert cache.stats()['entries'] == 0
+
+
+def test_formats_are_cached_separately():
+    cache = QueryCache()
+    cache.put(cache.make_key('duckdb', 'q', {'limit': 5}, 'json'), b'[]', 0)
+    assert cache.get(cache.make_key('duckdb', 'q', {'limit': 5}, 'arrow'), 0) is None
+
+
+def test_entry_from_other_generation_is_a_miss():
+    cache = QueryCache()
+    key = cache.make_key('duckdb', 'select 1', {'limit': 5})
+    cache.put(key, b'[]', 'old')
+    assert cache.get(key, 'new') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_invalidate_single_backend():
+    cache = QueryCache()
+    cache.put(cache.make_key('duckdb', 'q'), b'[]', 0)
+    cache.put(cache.make_key('clickhouse', 'q'), b'[]', 0)
+    assert cache.invalidate('clickhouse') == 1
+    assert cache.get(cache.make_key('duckdb', 'q'), 0) is not None
+
+
+def test_tee_caches_completed_stream():
+    cache = QueryCache()
+    key = cache.make_key('duckdb', 'q')
+    assert list(cache.tee(key, iter([b'ab', b'cd']), 0)) == [b'ab', b'cd']
+    assert cache.get(key, 0) == b'abcd'
+
+
+def test_tee_skips_streams_over_the_limit():
+    cache = QueryCache(max_bytes=3)
+    key = cache.make_key('duckdb', 'q')
+    assert b''.join(cache.tee(key, iter([b'ab', b'cd']), 0)) == b'abcd'
+    assert cache.stats()['entries'] == 0
+
+
+def test_tee_does_not_cache_abandoned_stream():
+    cache = QueryCache()
+    key = cache.make_key('duckdb', 'q')
+    stream = cache.tee(key, iter([b'ab', b'cd']), 0)
+    next(stream)
+    stream.close()
+    assert cache.stats()['entries'] == 0
+
+
+def test_watcher_tracks_run_results_mtime(tmp_path):
+    run_results = tmp_path / 'run_results.json'
+    run_results.write_text('{}')
+    os.utime(run_results, ns=(1_000_000_000, 1_000_000_000))
+    watcher = ChangeWatcher({'duckdb': [run_results_probe(run_results)]}, check_interval=0)
+    before = watcher.generation('duckdb')
+
+    os.utime(run_results, ns=(2_000_000_000, 2_000_000_000))
+    assert watcher.generation('duckdb') != before
+
+
+def test_watcher_throttles_probes():
+    calls = []
+    watcher = ChangeWatcher({'duckdb': [lambda: calls.append(1) or len(calls)]}, check_interval=3600)
+    assert watcher.generation('duckdb') == watcher.generation('duckdb')
+    assert len(calls) == 1
+
+
+def test_watcher_only_probes_requested_backend():
+    calls = []
+    watcher = ChangeWatcher({
+        'clickhouse': [lambda: calls.append('clickhouse')],
+        'duckdb': [lambda: calls.append('duckdb')],
+    }, check_interval=0)
+    watcher.generation('duckdb')
+    assert calls == ['duckdb']
+
+
+def test_slow_probe_does_not_block_other_backends_or_hits():
+    release = threading.Event()
+    started = threading.Event()
+    tokens = iter([1, 2])
+
+    def slow_probe():
+        token = next(tokens)
+        if token == 2:
+            started.set()
+            release.wait(5)
+        return token
+
+    watcher = ChangeWatcher({'clickhouse': [slow_probe], 'duckdb': [lambda: 0]}, check_interval=0)
+    first = watcher.generation('clickhouse')
+
+    probing = threading.Thread(target=watcher.generation, args=('clickhouse',))
+    probing.start()
+    assert started.wait(5)
+    try:
+        # Neither call waits on the in-flight probe
+        assert watcher.generation('duckdb') == (0,)
+        assert watcher.generation('clickhouse') == first
+    finally:
+        release.set()
+        probing.join()
+    assert watcher.generation('clickhouse') != first
+
+
+def test_failing_probe_does_not_hide_other_probe_changes():
+    dbt_run = [1]
+
+    def broken_probe():
+        raise ConnectionError('clickhouse down')
+
+    watcher = ChangeWatcher({'clickhouse': [broken_probe, lambda: dbt_run[0]]},
+                            check_interval=0, max_failures=10)
+    before = watcher.generation('clickhouse')
+    dbt_run[0] = 2
+    assert watcher.generation('clickhouse') != before
+
+
+def test_repeatedly_failing_probe_bypasses_cache():
+    healthy = [True]
+
+    def probe():
+        if not healthy[0]:
+            raise ConnectionError('clickhouse down')
+        return 1
+
+    watcher = ChangeWatcher({'clickhouse': [probe]}, check_interval=0, max_failures=2)
+    good = watcher.generation('clickhouse')
+    healthy[0] = False
+    assert watcher.generation('clickhouse') == good  # one failure: keep last token
+    assert watcher.generation('clickhouse') != watcher.generation('clickhouse')
+
+    healthy[0] = True
+    assert watcher.generation('clickhouse') == good
+
+
+def test_missing_run_results_is_generation_zero(tmp_path):
+    probe = run_results_probe(tmp_path / 'missing.json')
+    assert probe() == 0